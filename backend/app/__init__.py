@@ -5,7 +5,8 @@ from blockchain.blockchain import Blockchain
 import os
 
 db = SQLAlchemy()
-blockchain = Blockchain(difficulty=4)
+# difficulty为初始难度，之后根据最近区块的挖矿耗时自动调整，使出块耗时接近target_seal_time秒
+blockchain = Blockchain(difficulty=4, target_seal_time=2.0, retarget_window=10)
 
 def create_app():
     app = Flask(__name__)
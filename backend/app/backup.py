@@ -0,0 +1,392 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import create_engine, func, select
+
+from blockchain.block import Block
+from blockchain.blockchain import validate_block_segment
+from . import db, blockchain
+from .models import Product, Transaction, User
+
+MANIFEST_NAME = 'manifest.json'
+PROGRESS_NAME = 'import_progress.json'
+FORMAT_VERSION = 2
+DEFAULT_CHUNK_SIZE = 1000
+
+# 按外键依赖顺序导出/导入
+TABLES = [User, Product, Transaction]
+
+
+def _file_sha256(path: str) -> str:
+    """
+    计算文件的SHA256校验和
+    """
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for piece in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(piece)
+    return sha.hexdigest()
+
+
+def _read_json(path: str, default: Any = None) -> Any:
+    if not os.path.exists(path):
+        return default
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_json(path: str, data: Any) -> None:
+    """
+    先写临时文件再替换，避免中断时留下损坏的清单
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _encode_records(records: List[Dict[str, Any]]) -> bytes:
+    """
+    将记录编码为JSON Lines，键按字母排序，相同内容总是得到相同的字节
+    """
+    return b''.join(json.dumps(record, ensure_ascii=False, sort_keys=True).encode('utf-8') + b'\n'
+                    for record in records)
+
+
+def _write_chunk(path: str, content: bytes) -> str:
+    """
+    将JSON Lines内容写成gzip压缩的分块，返回校验和。
+    mtime固定为0，相同内容总是得到相同的校验和。
+    """
+    part_path = path + '.part'
+    with open(part_path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+            f.write(content)
+    os.replace(part_path, path)
+    return _file_sha256(path)
+
+
+def _read_chunk(path: str) -> List[Dict[str, Any]]:
+    with gzip.open(path, 'rb') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _chunk_is_reusable(backup_dir: str, entry: Optional[Dict[str, Any]], expected: Dict[str, Any]) -> bool:
+    """
+    断点续传：清单中已有的分块若文件完整且内容描述一致则跳过
+    """
+    if not entry or any(entry.get(key) != value for key, value in expected.items()):
+        return False
+    path = os.path.join(backup_dir, entry['file'])
+    return os.path.exists(path) and _file_sha256(path) == entry['sha256']
+
+
+def _serialize_row(model, row) -> Dict[str, Any]:
+    record = {}
+    for column in model.__table__.columns:
+        value = getattr(row, column.key)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        record[column.key] = value
+    return record
+
+
+def _deserialize_row(model, record: Dict[str, Any]) -> Dict[str, Any]:
+    row = {}
+    for column in model.__table__.columns:
+        value = record.get(column.key)
+        if value is not None and isinstance(column.type, db.DateTime):
+            value = datetime.fromisoformat(value)
+        row[column.key] = value
+    return row
+
+
+def _snapshot_database(path: str) -> None:
+    """
+    用SQLite在线备份接口将当前数据库一次性复制到path
+    """
+    source = db.engine.raw_connection()
+    try:
+        target = sqlite3.connect(path)
+        try:
+            source.connection.backup(target)
+        finally:
+            target.close()
+    finally:
+        source.close()
+
+
+def export_backup(backup_dir: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    将区块链和数据库表流式导出为压缩分块，并生成带校验和的清单。
+    先用SQLite在线备份接口复制出数据库快照并同时固定区块链，再从快照按主键分页读取，
+    导出内容彼此一致，且只在复制快照的短时间内持有数据库读锁。
+    对同一目录重复调用时，内容指纹未变的分块不会重新写入，实现断点续传。
+    需要在应用上下文中调用。
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    os.makedirs(backup_dir, exist_ok=True)
+    manifest_path = os.path.join(backup_dir, MANIFEST_NAME)
+
+    previous = _read_json(manifest_path, {})
+    if previous.get('version') != FORMAT_VERSION or previous.get('chunk_size') != chunk_size:
+        previous = {}
+
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        # 先把数据库一次性复制为快照，之后的压缩和写文件都读取快照，不占用数据库锁
+        snapshot_path = os.path.join(snapshot_dir, 'snapshot.db')
+        _snapshot_database(snapshot_path)
+        # 数据库快照完成后立即固定区块链，导出期间新挖出的区块留给下一次导出
+        chain = blockchain.chain[:]
+        engine = create_engine(f'sqlite:///{snapshot_path}')
+        try:
+            with engine.connect() as connection:
+                rows = {
+                    model.__tablename__: connection.execute(select(func.count()).select_from(model.__table__)).scalar()
+                    for model in TABLES
+                }
+                manifest = {
+                    'version': FORMAT_VERSION,
+                    'created_at': datetime.utcnow().isoformat(),
+                    'chunk_size': chunk_size,
+                    'consensus': blockchain.consensus_params(),
+                    'chain': {
+                        'height': len(chain),
+                        'tip_hash': chain[-1].hash,
+                        'chunks': []
+                    },
+                    'tables': {}
+                }
+
+                # 区块不可修改，范围和最后一个区块的哈希相同即说明分块内容未变
+                previous_chain_chunks = previous.get('chain', {}).get('chunks', [])
+                for number, start in enumerate(range(0, len(chain), chunk_size)):
+                    blocks = chain[start:start + chunk_size]
+                    expected = {
+                        'start': start,
+                        'count': len(blocks),
+                        'last_hash': blocks[-1].hash
+                    }
+                    entry = previous_chain_chunks[number] if number < len(previous_chain_chunks) else None
+                    if not _chunk_is_reusable(backup_dir, entry, expected):
+                        filename = f'chain-{number:06d}.jsonl.gz'
+                        entry = dict(expected, file=filename, first_previous_hash=blocks[0].previous_hash)
+                        entry['sha256'] = _write_chunk(os.path.join(backup_dir, filename),
+                                                       _encode_records([block.to_dict() for block in blocks]))
+                    manifest['chain']['chunks'].append(entry)
+                    _write_json(manifest_path, manifest)
+
+                for model in TABLES:
+                    table = model.__tablename__
+                    primary_key = model.__table__.primary_key.columns.values()[0]
+                    previous_table_chunks = previous.get('tables', {}).get(table, {}).get('chunks', [])
+                    manifest['tables'][table] = {'rows': rows[table], 'chunks': []}
+                    number, start, last_key = 0, 0, None
+                    while True:
+                        # 按主键分页，不受偏移量变化影响
+                        query = select(model.__table__).order_by(primary_key).limit(chunk_size)
+                        if last_key is not None:
+                            query = query.where(primary_key > last_key)
+                        page = connection.execute(query).fetchall()
+                        if not page:
+                            break
+                        content = _encode_records([_serialize_row(model, row) for row in page])
+                        # 数据表行可以被修改，只有内容指纹相同的分块才能复用
+                        expected = {
+                            'start': start,
+                            'count': len(page),
+                            'content_sha256': hashlib.sha256(content).hexdigest()
+                        }
+                        entry = previous_table_chunks[number] if number < len(previous_table_chunks) else None
+                        if not _chunk_is_reusable(backup_dir, entry, expected):
+                            filename = f'{table}-{number:06d}.jsonl.gz'
+                            entry = dict(expected, file=filename)
+                            entry['sha256'] = _write_chunk(os.path.join(backup_dir, filename), content)
+                        manifest['tables'][table]['chunks'].append(entry)
+                        _write_json(manifest_path, manifest)
+                        number, start, last_key = number + 1, start + len(page), getattr(page[-1], primary_key.key)
+        finally:
+            engine.dispose()
+
+    manifest['completed'] = True
+    _write_json(manifest_path, manifest)
+    return manifest
+
+
+def _load_chain_chunk(path: str, sha256: str) -> List[Block]:
+    """
+    在工作进程中校验并解析一个区块分块，返回的区块无需在主进程中重新计算哈希
+    """
+    if _file_sha256(path) != sha256:
+        raise ValueError(f"Checksum mismatch: {os.path.basename(path)}")
+    blocks = [Block.from_dict(data) for data in _read_chunk(path)]
+    if not validate_block_segment(blocks):
+        raise ValueError(f"Invalid blocks in chunk: {os.path.basename(path)}")
+    return blocks
+
+
+def _load_table_chunk(path: str, sha256: str) -> List[Dict[str, Any]]:
+    """
+    在工作进程中校验并解析一个数据表分块
+    """
+    if _file_sha256(path) != sha256:
+        raise ValueError(f"Checksum mismatch: {os.path.basename(path)}")
+    return _read_chunk(path)
+
+
+def import_backup(backup_dir: str, workers: Optional[int] = None, load_chain: bool = True,
+                  replace: bool = False) -> Dict[str, Any]:
+    """
+    从备份目录引导节点：多进程并行校验各分块，再按顺序批量写入数据库。
+    已导入的数据表分块记录在进度文件中，中断后重新执行会从断点继续。
+    首次导入要求数据表为空；replace为True时先清空现有数据再导入。
+    需要在应用上下文中调用。
+    """
+    manifest = _read_json(os.path.join(backup_dir, MANIFEST_NAME))
+    if manifest is None:
+        raise ValueError(f"No backup manifest found in {backup_dir}")
+    if manifest.get('version') != FORMAT_VERSION or not manifest.get('completed'):
+        raise ValueError("Backup is incomplete or has an unsupported format")
+    if manifest['consensus'] != blockchain.consensus_params():
+        raise ValueError("Backup was created with different difficulty settings")
+
+    progress_path = os.path.join(backup_dir, PROGRESS_NAME)
+    progress = _read_json(progress_path, {'created_at': manifest['created_at'], 'tables': {}})
+    if progress.get('created_at') != manifest['created_at']:
+        raise ValueError("Import progress belongs to a different backup; remove it to start over")
+    # 进度文件存在说明之前的导入已经开始，数据表中的数据来自本备份
+    if not replace and not os.path.exists(progress_path):
+        non_empty = [model.__tablename__ for model in TABLES if model.query.first() is not None]
+        if non_empty:
+            raise ValueError(f"Tables already contain data: {', '.join(non_empty)}; "
+                             f"import into an empty database or use replace")
+
+    result = {'blocks': 0, 'rows': {}}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chain_chunks = manifest['chain']['chunks']
+        chain = []
+        futures = [
+            executor.submit(_load_chain_chunk, os.path.join(backup_dir, entry['file']), entry['sha256'])
+            for entry in chain_chunks
+        ]
+        # 各分块内部已并行验证，这里只需检查分块之间的链接
+        previous_hash = None
+        for entry, future in zip(chain_chunks, futures):
+            blocks = future.result()
+            if len(blocks) != entry['count'] or blocks[0].index != entry['start']:
+                raise ValueError(f"Unexpected block range in chunk: {entry['file']}")
+            if previous_hash is not None and blocks[0].previous_hash != previous_hash:
+                raise ValueError(f"Chunk does not link to previous chunk: {entry['file']}")
+            previous_hash = blocks[-1].hash
+            chain.extend(blocks)
+        if len(chain) != manifest['chain']['height'] or previous_hash != manifest['chain']['tip_hash']:
+            raise ValueError("Restored chain does not match the manifest")
+        # 难度调整规则依赖前序区块，无法按分块并行验证，在这里顺序检查
+        if not blockchain.validate_targets(chain):
+            raise ValueError("Restored chain violates the difficulty retargeting rule")
+        result['blocks'] = len(chain)
+
+        if replace:
+            # 区块链校验通过后再清空，按外键依赖的逆序删除
+            try:
+                for model in reversed(TABLES):
+                    model.query.delete()
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            progress = {'created_at': manifest['created_at'], 'tables': {}}
+        # 写入数据前先记录导入已开始
+        _write_json(progress_path, progress)
+
+        for model in TABLES:
+            table = model.__tablename__
+            done = progress['tables'].setdefault(table, [])
+            pending = [entry for entry in manifest['tables'][table]['chunks'] if entry['file'] not in done]
+            futures = [
+                executor.submit(_load_table_chunk, os.path.join(backup_dir, entry['file']), entry['sha256'])
+                for entry in pending
+            ]
+            primary_key = model.__table__.primary_key.columns.values()[0]
+            imported = 0
+            for entry, future in zip(pending, futures):
+                records = future.result()
+                if len(records) != entry['count']:
+                    raise ValueError(f"Unexpected row count in chunk: {entry['file']}")
+                # 每个分块在一个事务中提交；若提交后、写进度文件前中断，分块的第一行已存在，直接跳过
+                if model.query.get(records[0][primary_key.key]) is not None:
+                    done.append(entry['file'])
+                    _write_json(progress_path, progress)
+                    continue
+                try:
+                    db.session.bulk_insert_mappings(model, [_deserialize_row(model, r) for r in records])
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    raise
+                done.append(entry['file'])
+                _write_json(progress_path, progress)
+                imported += len(records)
+            result['rows'][table] = imported
+
+    if load_chain:
+        blockchain.load_chain(chain)
+    return result
+
+
+def fetch_backup(base_url: str, backup_dir: str, token: str) -> Dict[str, Any]:
+    """
+    从运行中的节点下载备份。未完成的分块以.part文件保留，
+    再次执行时通过HTTP Range从断点续传；已校验通过的分块直接跳过。
+    """
+    import requests
+
+    os.makedirs(backup_dir, exist_ok=True)
+    headers = {'Authorization': f'Bearer {token}'}
+    response = requests.get(f'{base_url}/api/backup/manifest', headers=headers)
+    response.raise_for_status()
+    manifest = response.json()
+    # 下载完成前移除旧清单，防止导入用到新旧混合的分块
+    manifest_path = os.path.join(backup_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    entries = list(manifest['chain']['chunks'])
+    for table in manifest['tables'].values():
+        entries.extend(table['chunks'])
+
+    for entry in entries:
+        path = os.path.join(backup_dir, entry['file'])
+        if os.path.exists(path) and _file_sha256(path) == entry['sha256']:
+            continue
+        part_path = path + '.part'
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        request_headers = dict(headers)
+        if offset:
+            request_headers['Range'] = f'bytes={offset}-'
+        with requests.get(f"{base_url}/api/backup/chunks/{entry['file']}",
+                          headers=request_headers, stream=True) as chunk_response:
+            # 416表示.part文件已经下载完整，直接进入校验
+            if chunk_response.status_code != 416:
+                chunk_response.raise_for_status()
+                # 服务器不支持Range时会返回完整文件，需要从头写入
+                mode = 'ab' if chunk_response.status_code == 206 else 'wb'
+                with open(part_path, mode) as f:
+                    for piece in chunk_response.iter_content(chunk_size=1024 * 1024):
+                        f.write(piece)
+        if _file_sha256(part_path) != entry['sha256']:
+            os.remove(part_path)
+            raise ValueError(f"Checksum mismatch, retry to download again: {entry['file']}")
+        os.replace(part_path, path)
+
+    # 清单最后写入，确保只有分块齐全时导入才会开始
+    _write_json(manifest_path, manifest)
+    return manifest
@@ -1,8 +1,9 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, send_from_directory
 from datetime import datetime
 import hashlib
 from . import db, blockchain
 from .models import Product, Transaction, User
+from .backup import export_backup, MANIFEST_NAME, DEFAULT_CHUNK_SIZE
 import json
 import jwt
 from functools import wraps
@@ -196,6 +197,10 @@ def get_blockchain_status():
         'is_valid': blockchain.is_chain_valid()
     })
 
+@main.route('/api/blockchain/mining_stats', methods=['GET'])
+def get_mining_stats():
+    return jsonify(blockchain.get_mining_stats())
+
 @main.route('/api/blockchain/mine', methods=['POST'])
 @token_required
 def mine_block(current_user):
@@ -392,4 +397,51 @@ def delete_user(current_user, user_id):
         return jsonify({'message': 'User deleted successfully!'})
     except Exception as e:
         db.session.rollback()
-        return jsonify({'message': str(e)}), 400 
\ No newline at end of file
+        return jsonify({'message': str(e)}), 400
+
+# 新增：备份导出（区块链与数据库分块压缩导出，用于新节点引导）
+# 可通过 MAOTAI_BACKUP_DIR 指定源码目录之外的备份目录
+BACKUP_FOLDER = os.environ.get('MAOTAI_BACKUP_DIR',
+                               os.path.join(os.path.dirname(os.path.dirname(__file__)), 'backups'))
+
+@main.route('/api/backup/export', methods=['POST'])
+@token_required
+def create_backup(current_user):
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized!'}), 403
+
+    data = request.get_json(silent=True) or {}
+    chunk_size = data.get('chunk_size', DEFAULT_CHUNK_SIZE)
+    if not isinstance(chunk_size, int) or isinstance(chunk_size, bool) or chunk_size <= 0:
+        return jsonify({'message': 'chunk_size must be a positive integer!'}), 400
+    try:
+        manifest = export_backup(BACKUP_FOLDER, chunk_size)
+        return jsonify({
+            'message': 'Backup exported successfully!',
+            'manifest': manifest
+        }), 200
+    except Exception as e:
+        return jsonify({'message': str(e)}), 400
+
+@main.route('/api/backup/manifest', methods=['GET'])
+@token_required
+def get_backup_manifest(current_user):
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized!'}), 403
+
+    manifest_path = os.path.join(BACKUP_FOLDER, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return jsonify({'message': 'No backup available!'}), 404
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if not manifest.get('completed'):
+        return jsonify({'message': 'Backup is still in progress!'}), 409
+    return jsonify(manifest)
+
+@main.route('/api/backup/chunks/<filename>', methods=['GET'])
+@token_required
+def get_backup_chunk(current_user, filename):
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized!'}), 403
+    # 支持Range请求，中断的下载可以从断点继续
+    return send_from_directory(BACKUP_FOLDER, filename, conditional=True)
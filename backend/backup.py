@@ -0,0 +1,54 @@
+"""
+备份与节点引导命令行工具
+
+    python backup.py fetch http://主节点:15000 ./backups --token YOUR_TOKEN
+    python backup.py import ./backups --workers 8 [--replace]
+
+import 要求数据库为空，--replace 会先清空现有的用户、产品和交易数据；
+区块链保存在服务进程的内存中，import 只导入数据库并校验区块；
+要让服务加载区块链，启动时设置 MAOTAI_BOOTSTRAP_DIR 指向备份目录。
+"""
+import argparse
+import logging
+import sys
+
+from app import create_app
+from app.backup import fetch_backup, import_backup
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='茅台溯源系统备份工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    fetch_parser = subparsers.add_parser('fetch', help='从运行中的节点下载备份（支持断点续传）')
+    fetch_parser.add_argument('url', help='节点地址，例如 http://localhost:15000')
+    fetch_parser.add_argument('backup_dir', help='本地备份目录')
+    fetch_parser.add_argument('--token', required=True, help='管理员JWT Token')
+
+    import_parser = subparsers.add_parser('import', help='校验备份并导入数据库（支持断点续传）')
+    import_parser.add_argument('backup_dir', help='本地备份目录')
+    import_parser.add_argument('--workers', type=int, default=None, help='并行校验的进程数，默认使用CPU核数')
+    import_parser.add_argument('--replace', action='store_true', help='导入前清空现有的数据表')
+
+    args = parser.parse_args()
+
+    if args.command == 'fetch':
+        manifest = fetch_backup(args.url.rstrip('/'), args.backup_dir, args.token)
+        logger.info(f"Fetched backup with {manifest['chain']['height']} blocks")
+    elif args.command == 'import':
+        app = create_app()
+        try:
+            with app.app_context():
+                result = import_backup(args.backup_dir, workers=args.workers, load_chain=False,
+                                       replace=args.replace)
+        except ValueError as e:
+            logger.error(f"Import failed: {str(e)}")
+            sys.exit(1)
+        logger.info(f"Verified {result['blocks']} blocks, imported rows: {result['rows']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,24 @@
 import hashlib
 import json
 import time
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+# 哈希值的最大可能取值，目标值越小挖矿越难
+MAX_TARGET = 2 ** 256 - 1
 
 class Block:
-    def __init__(self, index: int, transactions: list, timestamp: float, previous_hash: str):
+    def __init__(self, index: int, transactions: list, timestamp: float, previous_hash: str,
+                 target: int = MAX_TARGET, previous_seal_ms: Optional[int] = None,
+                 nonce: int = 0, block_hash: Optional[str] = None):
         self.index = index
         self.timestamp = timestamp
         self.transactions = transactions
         self.previous_hash = previous_hash
-        self.nonce = 0
-        self.hash = self.calculate_hash()
+        self.target = target  # 工作量证明目标值，区块哈希（按整数）不得大于该值
+        self.previous_seal_ms = previous_seal_ms  # 上一个区块的挖矿耗时（毫秒），用于难度调整
+        self.nonce = nonce
+        # 还原已有区块时直接使用给定的哈希，避免重复计算
+        self.hash = block_hash if block_hash is not None else self.calculate_hash()
 
     def calculate_hash(self) -> str:
         """
@@ -21,17 +29,24 @@ class Block:
             "timestamp": self.timestamp,
             "transactions": self.transactions,
             "previous_hash": self.previous_hash,
+            "target": f"{self.target:064x}",
+            "previous_seal_ms": self.previous_seal_ms,
             "nonce": self.nonce
         }, sort_keys=True).encode()
         
         return hashlib.sha256(block_string).hexdigest()
 
-    def mine_block(self, difficulty: int) -> None:
+    def meets_target(self) -> bool:
+        """
+        判断区块哈希是否满足工作量证明目标值
+        """
+        return int(self.hash, 16) <= self.target
+
+    def mine_block(self) -> None:
         """
         挖矿过程
         """
-        target = "0" * difficulty
-        while self.hash[:difficulty] != target:
+        while not self.meets_target():
             self.nonce += 1
             self.hash = self.calculate_hash()
 
@@ -45,5 +60,15 @@ class Block:
             "transactions": self.transactions,
             "previous_hash": self.previous_hash,
             "hash": self.hash,
+            "target": f"{self.target:064x}",
+            "previous_seal_ms": self.previous_seal_ms,
             "nonce": self.nonce
-        } 
\ No newline at end of file
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Block":
+        """
+        从字典格式还原区块（保留原有的nonce和哈希，不重新挖矿）
+        """
+        return cls(data["index"], data["transactions"], data["timestamp"], data["previous_hash"],
+                   int(data["target"], 16), data["previous_seal_ms"], data["nonce"], data["hash"])
@@ -1,8 +1,8 @@
 import json
 import time
 import hashlib
-from typing import List, Dict, Any
-from .block import Block
+from typing import List, Dict, Any, Optional, Tuple
+from .block import Block, MAX_TARGET
 
 class SmartContract:
     def __init__(self):
@@ -24,10 +24,46 @@ class SmartContract:
         required_fields = ['product_id', 'to_location', 'operator', 'price']
         return all(field in transaction for field in required_fields)
 
+def validate_block_segment(blocks: List[Block]) -> bool:
+    """
+    验证一段连续区块：哈希、工作量证明、段内编号和链接以及交易规则。
+    与相邻段的链接以及难度调整规则由调用方检查，因此不同段可以并行验证。
+    """
+    smart_contract = SmartContract()
+    previous_hash = None
+    previous_index = None
+    for block in blocks:
+        if block.hash != block.calculate_hash():
+            return False
+        if not 0 < block.target <= MAX_TARGET or not block.meets_target():
+            return False
+        if block.previous_seal_ms is not None and block.previous_seal_ms < 0:
+            return False
+        if previous_hash is not None and block.previous_hash != previous_hash:
+            return False
+        if previous_index is not None and block.index != previous_index + 1:
+            return False
+        for transaction in block.transactions:
+            transaction_type = transaction.get('type')
+            if transaction_type in smart_contract.rules:
+                if not smart_contract.rules[transaction_type](transaction):
+                    return False
+        previous_hash = block.hash
+        previous_index = block.index
+    return True
+
 class Blockchain:
-    def __init__(self, difficulty: int = 4):
+    def __init__(self, difficulty: int = 4, target_seal_time: float = 2.0, retarget_window: int = 10):
+        if not 0 <= difficulty < 64:
+            raise ValueError("difficulty must be between 0 and 63")
+        if target_seal_time < 0.001 or retarget_window <= 0:
+            raise ValueError("target_seal_time must be at least 0.001 and retarget_window must be positive")
         self.chain: List[Block] = []
-        self.difficulty = difficulty
+        self.difficulty = difficulty  # 初始难度（哈希前导十六进制零的个数），决定创世区块的目标值
+        self.initial_target = MAX_TARGET >> (4 * difficulty)
+        self.target_seal_ms = int(target_seal_time * 1000)  # 期望的单个区块挖矿耗时
+        self.retarget_window = retarget_window  # 难度调整参考的最近区块数
+        self.last_seal_ms: Optional[int] = None  # 最新区块的挖矿耗时，记录在下一个区块中
         self.pending_transactions = []
         self.smart_contract = SmartContract()
         self.mining_reward = 10  # 挖矿奖励
@@ -37,10 +73,66 @@ class Blockchain:
         """
         创建创世区块
         """
-        genesis_block = Block(0, [], time.time(), "0")
-        genesis_block.mine_block(self.difficulty)
+        genesis_block = Block(0, [], time.time(), "0", self.initial_target)
+        self._seal_block(genesis_block)
         self.chain.append(genesis_block)
 
+    def _seal_block(self, block: Block) -> None:
+        """
+        挖矿并记录耗时
+        """
+        start = time.perf_counter()
+        block.mine_block()
+        self.last_seal_ms = int((time.perf_counter() - start) * 1000)
+
+    def _seal_samples(self, chain: List[Block], index: int,
+                      previous_seal_ms: Optional[int]) -> List[Tuple[int, int]]:
+        """
+        获取第index个区块之前最近若干区块的(目标值, 挖矿耗时)。
+        区块j的耗时记录在区块j+1中，区块index-1的耗时由previous_seal_ms给出。
+        """
+        samples = []
+        for j in range(max(0, index - self.retarget_window), index):
+            seal_ms = chain[j + 1].previous_seal_ms if j + 1 < index else previous_seal_ms
+            if seal_ms is not None:
+                samples.append((chain[j].target, seal_ms))
+        return samples
+
+    def calculate_target(self, chain: List[Block], index: int, previous_seal_ms: Optional[int]) -> int:
+        """
+        根据最近区块的实际挖矿耗时计算第index个区块的目标值。
+        先估算算力（期望哈希次数/耗时），再求出使挖矿耗时等于期望值的目标值；
+        每次调整幅度限制在4倍以内，全部使用整数运算，保证各节点计算结果一致。
+        """
+        if index == 0:
+            return self.initial_target
+        previous_target = chain[index - 1].target
+        samples = self._seal_samples(chain, index, previous_seal_ms)
+        if not samples:
+            return previous_target
+        attempts = sum((MAX_TARGET + 1) // (target + 1) for target, _ in samples)
+        total_ms = sum(seal_ms for _, seal_ms in samples)
+        target = (MAX_TARGET + 1) * total_ms // (attempts * self.target_seal_ms)
+        target = max(target, previous_target // 4, 1)
+        return min(target, previous_target * 4, MAX_TARGET)
+
+    def validate_targets(self, chain: List[Block]) -> bool:
+        """
+        验证每个区块的目标值符合难度调整规则。
+        区块记录的上一个区块挖矿耗时不能超过两个区块的时间戳之差，
+        防止虚报耗时来降低难度。
+        """
+        for i, block in enumerate(chain):
+            if i > 0 and block.previous_seal_ms is not None:
+                previous_block = chain[i - 1]
+                if block.timestamp < previous_block.timestamp:
+                    return False
+                if block.previous_seal_ms > (block.timestamp - previous_block.timestamp) * 1000:
+                    return False
+            if block.target != self.calculate_target(chain, i, block.previous_seal_ms):
+                return False
+        return True
+
     def get_latest_block(self) -> Block:
         """
         获取最新的区块
@@ -60,13 +152,20 @@ class Blockchain:
         }
         self.pending_transactions.append(reward_transaction)
 
+        # 时间戳不得早于上一个区块的时间戳加上其挖矿耗时（系统时钟回拨时仍满足验证规则）
+        timestamp = time.time()
+        if self.last_seal_ms is not None:
+            timestamp = max(timestamp, self.get_latest_block().timestamp + (self.last_seal_ms + 1) / 1000)
+
         block = Block(
             len(self.chain),
             self.pending_transactions,
-            time.time(),
-            self.get_latest_block().hash
+            timestamp,
+            self.get_latest_block().hash,
+            self.calculate_target(self.chain, len(self.chain), self.last_seal_ms),
+            self.last_seal_ms
         )
-        block.mine_block(self.difficulty)
+        self._seal_block(block)
         self.chain.append(block)
         self.pending_transactions = []
         return block
@@ -84,6 +183,50 @@ class Blockchain:
         self.pending_transactions.append(transaction)
         return self.get_latest_block().index + 1
 
+    def load_chain(self, blocks: List[Block]) -> None:
+        """
+        用已验证的区块替换当前链（用于从备份引导节点）
+        """
+        if not blocks:
+            raise ValueError("Cannot load an empty chain")
+        self.chain = blocks
+        self.pending_transactions = []
+        # 备份中不包含最新区块的挖矿耗时，下一个区块不参考该样本
+        self.last_seal_ms = None
+
+    def consensus_params(self) -> Dict[str, Any]:
+        """
+        难度调整相关的共识参数，各节点必须一致
+        """
+        return {
+            'initial_target': f"{self.initial_target:064x}",
+            'target_seal_ms': self.target_seal_ms,
+            'retarget_window': self.retarget_window
+        }
+
+    def get_mining_stats(self) -> Dict[str, Any]:
+        """
+        获取挖矿耗时统计和当前难度
+        """
+        index = len(self.chain)
+        samples = self._seal_samples(self.chain, index, self.last_seal_ms)
+        seal_times = [seal_ms / 1000 for _, seal_ms in samples]
+        total_ms = sum(seal_ms for _, seal_ms in samples)
+        attempts = sum((MAX_TARGET + 1) // (target + 1) for target, _ in samples)
+        current_target = self.get_latest_block().target
+        return {
+            'target_seal_time': self.target_seal_ms / 1000,
+            'retarget_window': self.retarget_window,
+            'current_target': f"{current_target:064x}",
+            'next_target': f"{self.calculate_target(self.chain, index, self.last_seal_ms):064x}",
+            'difficulty': (MAX_TARGET + 1) / (current_target + 1),  # 相对于目标值为最大值时的期望哈希次数
+            'recent_seal_times': seal_times,
+            'average_seal_time': sum(seal_times) / len(seal_times) if seal_times else None,
+            'min_seal_time': min(seal_times) if seal_times else None,
+            'max_seal_time': max(seal_times) if seal_times else None,
+            'hash_rate': attempts * 1000 / total_ms if total_ms else None  # 估算的每秒哈希次数
+        }
+
     def get_chain(self) -> List[Dict[str, Any]]:
         """
         获取整个区块链
@@ -94,24 +237,8 @@ class Blockchain:
         """
         验证区块链是否有效
         """
-        for i in range(1, len(self.chain)):
-            current_block = self.chain[i]
-            previous_block = self.chain[i-1]
-
-            if current_block.hash != current_block.calculate_hash():
-                return False
-
-            if current_block.previous_hash != previous_block.hash:
-                return False
-
-            # 验证区块中的交易
-            for transaction in current_block.transactions:
-                transaction_type = transaction.get('type')
-                if transaction_type in self.smart_contract.rules:
-                    if not self.smart_contract.rules[transaction_type](transaction):
-                        return False
-
-        return True
+        # 与从备份导入时使用同一套规则：哈希、工作量证明、编号和链接、交易规则以及难度调整
+        return validate_block_segment(self.chain) and self.validate_targets(self.chain)
 
     def get_product_history(self, product_id: str) -> List[Dict[str, Any]]:
         """
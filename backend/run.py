@@ -1,5 +1,7 @@
 from app import create_app
+from app.backup import import_backup
 import logging
+import os
 
 # 配置日志
 logging.basicConfig(level=logging.DEBUG)
@@ -13,5 +15,13 @@ except Exception as e:
     raise
 
 if __name__ == '__main__':
+    # 从备份目录引导节点（恢复区块链并导入尚未导入的数据表分块）。
+    # 放在__main__中，避免spawn方式启动的校验进程重新导入本文件时再次执行；
+    # 调试模式下只在实际提供服务的重载子进程中执行一次。
+    bootstrap_dir = os.environ.get('MAOTAI_BOOTSTRAP_DIR')
+    if bootstrap_dir and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        with app.app_context():
+            result = import_backup(bootstrap_dir)
+        logger.info(f"Bootstrapped {result['blocks']} blocks from {bootstrap_dir}")
     logger.info("Starting Flask application...")
-    app.run(debug=True, port=15000, host='0.0.0.0') 
\ No newline at end of file
+    app.run(debug=True, port=15000, host='0.0.0.0')